@@ -1,13 +1,16 @@
 """Function definition for the boundaries of BESS"""
+from collections import deque
+
+import numpy as np
 import pyomo.environ as pyo
 from Data.constants import *
 from Data.loading import *
 
 def soc_dyn_rule(m, t):
-    if t == T-1:
+    if t + 1 not in m.T:
         # dynamique de 0..T-1, on peut soit faire cyclique, soit ignorer le dernier pas
         return pyo.Constraint.Skip
-    return m.SOC[t+1] == m.SOC[t] + eta_ch * m.P_ch[t] * dt - eta_dis * m.P_dis[t] * dt
+    return m.SOC[t+1] == m.SOC[t] + eta_ch * m.P_ch[t] * dt - m.P_dis[t] / eta_dis * dt
 
 # model.SOCdyn = pyo.Constraint(model.T, rule=soc_dyn_rule)
 
@@ -49,3 +52,71 @@ def power_balance_rule(m, t):
 # model.PowerBalance = pyo.Constraint(model.T, rule=power_balance_rule)
 
 
+# --- 3.10 Batterie : dégradation (post-traitement du SOC) ---
+def rainflow(soc):
+    """
+    Comptage rainflow (ASTM E1049) d'une série de SOC.
+    Retourne (amplitudes, nombres) : 1 pour un cycle complet, 0.5 pour un demi-cycle.
+    """
+    x = np.asarray(soc, dtype=float)
+    x = x[np.diff(x, prepend=np.nan) != 0]    # plateaux (série vide acceptée)
+    if len(x) < 2:
+        return np.zeros(0), np.zeros(0)
+    d = np.diff(x)
+    reversals = x[np.concatenate(([True], d[1:] * d[:-1] < 0, [True]))]
+
+    # chaque point est empilé et dépilé au plus une fois : O(n)
+    stack, ranges, counts = deque(), [], []
+    for point in reversals:
+        stack.append(point)
+        while len(stack) >= 3:
+            X = abs(stack[-1] - stack[-2])
+            Y = abs(stack[-2] - stack[-3])
+            if X < Y:
+                break
+            ranges.append(Y)
+            if len(stack) == 3:
+                counts.append(0.5)
+                stack.popleft()
+            else:
+                counts.append(1.0)
+                last = stack.pop()
+                stack.pop()
+                stack.pop()
+                stack.append(last)
+
+    residue = np.abs(np.diff(np.array(stack)))
+    ranges = np.concatenate((ranges, residue))
+    counts = np.concatenate((counts, np.full(len(residue), 0.5)))
+    return ranges, counts
+
+def cycle_damage(soc, E_bat_max):
+    """
+    Fraction de la durée de vie consommée sur la série (règle de Miner).
+    La DoD est rapportée à l'énergie utile (SOC_max - SOC_min) * E_bat_max,
+    comme c_deg : un cycle utile complet compte pour un cycle de référence.
+    """
+    usable = (SOC_max - SOC_min) * E_bat_max
+    if usable <= 0:
+        return 0.0
+    ranges, counts = rainflow(soc)
+    dod = np.minimum(ranges / usable, 1.0)
+    return float(np.sum(counts * dod**k_woehler) / cycles_ref)
+
+def wear_cost(soc, p_dis, E_bat_max):
+    """
+    Coût de cyclage (€/MWh déchargé) qui facture au débit le dommage rainflow
+    de la série : c_bat_E * E_bat_max par durée de vie consommée. Vaut c_deg
+    pour des cycles utiles complets, plus bas pour des cycles partiels.
+    """
+    throughput = float(np.sum(p_dis)) * dt
+    if throughput <= 0 or E_bat_max <= 0:
+        return c_deg
+    return c_bat_E * E_bat_max * cycle_damage(soc, E_bat_max) / throughput
+
+def battery_lifetime(soc, E_bat_max):
+    """Durée de vie en cyclage (années) au rythme de la série, plafonnée à N."""
+    damage = cycle_damage(soc, E_bat_max)
+    years = len(soc) * dt / 8760
+    return N if damage <= 0 else min(N, years / damage)
+
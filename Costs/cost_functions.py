@@ -7,23 +7,39 @@ def capex_annual(m):
     return alpha * (c_bat_P * m.P_bat_max + c_bat_E * m.E_bat_max)
 
 # -- Helper : coût électricité --
-def cout_elec(m):
+def cout_elec(m, price=price_elec):
     return sum(
-        price_elec[t] * m.P_spot[t] * dt
+        price[t] * m.P_spot[t] * dt
         # (prix_a_terme * phi * P_electro_max + price_elec[t] * m.P_spot[t]) * dt
         for t in m.T
     )
 
 # -- Helper : émissions de CO2 --
-def emissions_co2(m):
+def emissions_co2(m, intensity=intensity_elec):
     return sum(
-        intensity_elec[t] * m.P_spot[t] * dt
+        intensity[t] * m.P_spot[t] * dt
         for t in m.T
     )
 
 
+# -- Helper : coût de dégradation (cyclage linéarisé) --
+def cout_degradation(m, cost=None):
+    # cost : coût de cyclage (€/MWh déchargé), c_deg par défaut ou recalé sur le rainflow
+    if not degradation:
+        return 0
+    if cost is None:
+        cost = c_deg
+    return sum(cost * m.P_dis[t] * dt for t in m.T)
+
+
+# -- Coût total annuel (minimisé et déclaré) --
+def cout_total(m, price=price_elec, cost=None):
+    # l'usure n'est comptée que par le coût de cyclage, le CAPEX reste annualisé sur N
+    return capex_annual(m) + cout_elec(m, price) + cout_degradation(m, cost)
+
+
 # -- Objectif : coût total annuel --
 def objective_rule(m):
-    return capex_annual(m) + cout_elec(m)
+    return capex_annual(m) + cout_elec(m) + cout_degradation(m)
  
 # model.Obj = pyo.Objective(rule=objective_rule, sense=pyo.minimize)
\ No newline at end of file
@@ -7,13 +7,18 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+import pyomo.environ as pyo
 from shiny import ui
 
-from Resolution.optimisation import (
-    RES_CAPEX_BAT_ENERGY,
-    RES_CAPEX_BAT_POWER,
-    RES_TOTAL_COST
-    )
+from Data.constants import c_bat_E, c_bat_P
+from Resolution.optimisation import solve_model
+
+# Résolution au chargement du tableau de bord
+model, _, _ = solve_model()
+
+RES_CAPEX_BAT_POWER      = c_bat_P
+RES_CAPEX_BAT_ENERGY     = c_bat_E
+RES_TOTAL_COST           = f"{pyo.value(model.Obj):.2f}"
 
 
 def ui_function() -> ui.Tag:
@@ -29,6 +29,12 @@ r_el = 10         # rampe max électrolyseur (MW/h)
 SOC_min = 0.1      # SOC min (fraction)
 SOC_max = 0.95     # SOC max (fraction)
 
+# Paramètres de dégradation batterie
+degradation = False    # coût de cyclage dans l'objectif, recalé sur le comptage rainflow du SOC
+cycles_ref = 6000      # nombre de cycles complets (100 % DoD) avant fin de vie
+k_woehler = 1.5        # exposant de la courbe de Wöhler : N(DoD) = cycles_ref * DoD**-k_woehler
+c_deg = c_bat_E / (cycles_ref * (SOC_max - SOC_min))   # coût de cyclage linéarisé (€/MWh déchargé)
+
 # Données H2
 LHV_H2 = 55        # kWh/kg (PEM)
 H2_target = 10_000_000 # objectif annuel de production H2 (kg) à adapter
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""Precomputed statistics over price_elec / intensity_elec for fast queries"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from Data.constants import SOC_max, SOC_min, dt, eta_ch, eta_dis
+from Data.loading import PATH, loading_function
+
+SERIES = ("price", "intensity")
+WINDOWS = (24, 168)              # fenêtres glissantes (heures)
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+# -- Construction de l'index --
+def _day_bounds(dates):
+    days = pd.to_datetime(pd.Series(dates)).dt.normalize().to_numpy()
+    cuts = np.flatnonzero(days[1:] != days[:-1]) + 1
+    edges = np.concatenate(([0], cuts, [len(days)]))
+    return edges[:-1], np.diff(edges)
+
+def _daily_sorted(values, day_start, day_count):
+    # matrice (jours, heures) triée par jour, complétée par NaN pour les jours courts
+    H = int(day_count.max())
+    col = np.arange(H)
+    valid = col[None, :] < day_count[:, None]
+    idx = np.where(valid, day_start[:, None] + col[None, :], 0)
+    mat = np.where(valid, values[idx], np.nan)
+
+    order = np.argsort(mat, axis=1, kind="stable")    # NaN en fin de ligne
+    sorted_ = np.take_along_axis(mat, order, axis=1)
+    order = np.where(valid, day_start[:, None] + order, -1)
+
+    cumsum = np.zeros((len(day_start), H + 1))
+    cumsum[:, 1:] = np.nancumsum(sorted_, axis=1)
+    return sorted_, order, cumsum
+
+def build_index(price, intensity, dates, windows=WINDOWS, quantiles=QUANTILES):
+    day_start, day_count = _day_bounds(dates)
+    index = {
+        "day_start": day_start,
+        "day_count": day_count,
+        "windows": np.asarray(windows, dtype=int),
+        "quantiles": np.asarray(quantiles, dtype=float),
+    }
+    for name, values in zip(SERIES, (price, intensity)):
+        values = np.asarray(values, dtype=float)
+        sorted_, order, cumsum = _daily_sorted(values, day_start, day_count)
+        index[f"{name}_sorted"] = sorted_
+        index[f"{name}_order"] = order
+        index[f"{name}_cumsum"] = cumsum
+
+        serie = pd.Series(values)
+        index[f"{name}_rolling"] = np.array([
+            [serie.rolling(w, min_periods=1).quantile(q).to_numpy() for q in quantiles]
+            for w in windows
+        ])
+    levels = np.sort(np.asarray(price, dtype=float))
+    index["price_levels"] = levels
+    index["price_levels_cumsum"] = np.concatenate(([0.0], np.cumsum(levels)))
+    return index
+
+
+# -- Cache à côté des données --
+def index_path(path=PATH):
+    return Path(path).with_suffix(".index.npz")
+
+def load_index(path=PATH, windows=WINDOWS, quantiles=QUANTILES):
+    """Charge l'index depuis le cache, ou le reconstruit si les données ont changé."""
+    path = Path(path)
+    cache = index_path(path)
+    stat = path.stat()
+    stamp = np.array([stat.st_mtime_ns, stat.st_size])
+
+    if cache.exists():
+        with np.load(cache) as f:
+            index = dict(f)
+        if (
+            np.array_equal(index.pop("stamp"), stamp)
+            and np.array_equal(index["windows"], windows)
+            and np.allclose(index["quantiles"], quantiles)
+            and "price_levels_cumsum" in index
+        ):
+            return index
+
+    price, intensity, _, data = loading_function(path)
+    index = build_index(price, intensity, data["Date"], windows, quantiles)
+    np.savez(cache, stamp=stamp, **index)
+    return index
+
+
+# -- Requêtes --
+def daily_spread(index, series="price"):
+    """Écart max - min de chaque jour."""
+    sorted_ = index[f"{series}_sorted"]
+    last = index["day_count"] - 1
+    return sorted_[np.arange(len(last)), last] - sorted_[:, 0]
+
+def cheapest_hours(index, n, series="price"):
+    """
+    Indices des n heures les moins chères de chaque jour et leur valeur moyenne.
+    Les jours de moins de n heures (changement d'heure, jours partiels) sont
+    complétés par l'indice -1 et leur moyenne vaut NaN.
+    """
+    day_count = index["day_count"]
+    if not 0 < n <= day_count.max():
+        raise ValueError(f"n doit être compris entre 1 et {int(day_count.max())}")
+    hours = index[f"{series}_order"][:, :n]
+    mean = np.where(day_count >= n, index[f"{series}_cumsum"][:, n] / n, np.nan)
+    return hours, mean
+
+def rolling_quantile(index, window, q, series="price"):
+    """Quantile q sur la fenêtre glissante window (heures) se terminant en chaque pas."""
+    w = np.flatnonzero(index["windows"] == window)
+    k = np.flatnonzero(np.isclose(index["quantiles"], q))
+    if not len(w) or not len(k):
+        raise KeyError(f"Fenêtre {window} h / quantile {q} absents de l'index")
+    return index[f"{series}_rolling"][w[0], k[0]]
+
+def arbitrage_upper_bound(index, E, P):
+    """
+    Borne supérieure du revenu d'arbitrage (€) d'une batterie E MWh / P MW sur
+    tout l'horizon des données, stockage entre jours et SOC initial libre compris.
+    Relaxation du dispatch : décharge <= min(P, eta_dis E utile / dt), charge
+    <= min(P, E utile / (eta_ch dt)) à chaque heure, et énergie déchargée <=
+    énergie chargée + E utile sur l'horizon. Toute valeur du multiplicateur
+    mu >= 0 de ce bilan donne une borne valide (dualité faible) : les heures
+    au-dessus de mu sont déchargées, celles en dessous chargées, et E utile est
+    valorisée à mu. mu est pris au rang qui minimise la borne, et les sommes
+    viennent des cumuls des prix triés : coût constant par requête.
+    E et P peuvent être des tableaux (évaluation sur une grille).
+    """
+    E = np.asarray(E, dtype=float)
+    P = np.asarray(P, dtype=float)
+    usable = (SOC_max - SOC_min) * E
+    levels = index["price_levels"]
+    cumsum = index["price_levels_cumsum"]
+    n = len(levels)
+
+    p_dis = np.minimum(P, eta_dis * usable / dt)
+    p_ch = np.minimum(P, usable / (eta_ch * dt))
+
+    # optimum de la relaxation : p_ch * (heures sous mu) + E utile / dt = p_dis * (heures au-dessus)
+    rate = np.maximum(p_ch + p_dis, 1e-12)
+    j = np.clip(np.floor((p_dis * n - usable / dt) / rate), 0, n - 1).astype(int)
+    j = np.maximum(j, np.searchsorted(levels, 0.0))   # mu >= 0
+    mu = np.where(j < n, levels[np.minimum(j, n - 1)], 0.0).clip(min=0.0)
+
+    gain_ch = mu * j - cumsum[j]
+    gain_dis = (cumsum[n] - cumsum[j]) - mu * (n - j)
+    bound = dt * (p_dis * gain_dis + p_ch * gain_ch) + mu * usable
+    return float(bound) if bound.ndim == 0 else bound
+
+def prune_bounds(index, bounds, c_P, c_E, alpha, n_grid=101):
+    """
+    Resserre bounds = [(P_min, P_max), (E_min, E_max)] en écartant les tailles
+    dont le CAPEX annualisé dépasse la borne d'arbitrage : elles coûtent plus
+    qu'elles ne peuvent rapporter. La borne porte sur tout l'horizon des données,
+    qui doit donc couvrir une année pour être comparée au CAPEX annualisé.
+    La relaxation ignore la continuité du SOC d'une heure à l'autre : la borne
+    est large (plusieurs fois le gain du LP) et n'écarte que les tailles
+    nettement surdimensionnées.
+    """
+    (P_lo, P_hi), (E_lo, E_hi) = bounds
+    P = np.linspace(P_lo, P_hi, n_grid)
+    E = np.linspace(E_lo, E_hi, n_grid)
+    PP, EE = np.meshgrid(P, E, indexing="ij")
+
+    capex = alpha * (c_P * PP + c_E * EE)
+    profitable = arbitrage_upper_bound(index, EE, PP) >= capex
+    if not profitable.any():
+        return [(P_lo, P_lo), (E_lo, E_lo)]
+
+    # la borne n'est évaluée que sur la grille : on garde un pas de marge, la
+    # taille rentable la plus grande pouvant se trouver entre deux points
+    i = min(np.flatnonzero(profitable.any(axis=1)).max() + 1, n_grid - 1)
+    j = min(np.flatnonzero(profitable.any(axis=0)).max() + 1, n_grid - 1)
+    return [(P_lo, float(P[i])), (E_lo, float(E[j]))]
@@ -14,7 +14,7 @@ def el_max_rule(m, t):
 
 # --- 3.7 Électrolyseur : rampes ---
 def el_ramp_rule(m, t):
-    if t == 0:
+    if t - 1 not in m.T:
         # on peut imposer une condition initiale (par ex. démarrage à u_el_min*P_electro_max)
         return pyo.Constraint.Skip
     return pyo.inequality(-r_el, m.P_electro[t] - m.P_electro[t-1], r_el)
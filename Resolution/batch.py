@@ -0,0 +1,435 @@
+"""
+Lancement en lot (sans interface) des études de dimensionnement.
+
+    python -m Resolution.batch run scenario.json --out results --workers 4
+    python -m Resolution.batch run scenario.json --out results --shard 2/8
+    python -m Resolution.batch merge results --out merged.json
+
+Fichier de scénario (JSON) : les clés de premier niveau sont les valeurs par
+défaut de chaque job, "jobs" liste des surcharges et "sweep" donne, pour chaque
+paramètre, la liste des valeurs à croiser (produit cartésien) avec chaque job.
+
+    {
+      "data": "Data/data.csv",
+      "solver": "highs",
+      "method": "lp",                      # lp | ga | decomposition
+      "parameters": {"P_electro_max": 100},  # constantes de Data/constants.py
+      "options": {},                       # arguments de la méthode
+      "jobs": [{"name": "lp"},
+               {"name": "decomp", "method": "decomposition",
+                "options": {"P_bat_max": 20, "E_bat_max": 80}}],
+      "sweep": {"H2_target": [8e6, 10e6]}
+    }
+
+Pour la méthode ga, seuls les paramètres de GA_PARAMETERS sont acceptés : ils
+sont traduits vers les constantes de Resolution/code_ines.py.
+
+Chaque shard K/N traite les jobs d'indice i tel que i % N == K et écrit son
+propre fichier : N machines indépendantes peuvent se partager une étude, les
+fichiers étant fusionnés ensuite avec la commande merge.
+"""
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import argparse
+import contextlib
+import hashlib
+import importlib
+import io
+import itertools
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("lp", "ga", "decomposition")
+PACKAGES = ("Data", "Battery", "Electrolyser", "Costs", "Resolution")
+
+
+# ========= 1. SCÉNARIO → LISTE DE JOBS =========
+
+def expand_scenario(scenario):
+    """Liste des jobs (dict) décrits par le scénario, numérotés dans l'ordre."""
+    defaults = {
+        "data": str(PROJECT_ROOT / "Data" / "data.csv"),
+        "solver": "highs",
+        "method": "lp",
+        "parameters": {},
+        "options": {},
+    }
+    defaults.update({k: v for k, v in scenario.items() if k not in ("jobs", "sweep")})
+
+    sweep = scenario.get("sweep", {})
+    names = list(sweep)
+    combos = list(itertools.product(*(sweep[n] for n in names)))
+
+    jobs = []
+    for base in scenario.get("jobs", [{}]):
+        for combo in combos:
+            job = {**defaults, **base}
+            job["parameters"] = {**defaults["parameters"], **base.get("parameters", {}),
+                                 **dict(zip(names, combo))}
+            job["options"] = {**defaults["options"], **base.get("options", {})}
+            if job["method"] not in METHODS:
+                raise ValueError(f"Méthode inconnue : {job['method']}")
+            job["id"] = len(jobs)
+            job["name"] = base.get("name", f"job{job['id']}") + "".join(
+                f"-{n}={v}" for n, v in zip(names, combo)
+            )
+            jobs.append(job)
+    return jobs
+
+
+def jobs_fingerprint(jobs):
+    """Empreinte (sha256) de la liste de jobs, pour vérifier que des shards vont ensemble."""
+    def portable(job):
+        # le chemin par défaut des données dépend de l'emplacement du dépôt
+        data = Path(job["data"])
+        if data.is_absolute() and data.is_relative_to(PROJECT_ROOT):
+            data = data.relative_to(PROJECT_ROOT)
+        return {**job, "data": data.as_posix()}
+
+    text = json.dumps([portable(job) for job in jobs], sort_keys=True, default=_to_json)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def parse_shard(text):
+    """'K/N' → (K, N)."""
+    k, n = (int(x) for x in text.split("/"))
+    if not 0 <= k < n:
+        raise argparse.ArgumentTypeError("shard attendu sous la forme K/N avec 0 <= K < N")
+    return k, n
+
+
+# ========= 2. EXÉCUTION D'UN JOB =========
+
+# Constantes de Data/constants.py → constantes propres à Resolution/code_ines.py,
+# qui ne lit pas Data.constants
+GA_PARAMETERS = {
+    "c_bat_P": "CAPEX_PWR_BAT",
+    "c_bat_E": "CAPEX_EN_BAT",
+    "r": "r",
+    "N": "N_years",
+    "P_electro_max": "P_ELECTRO_MAX",
+    "u_el_max": "U_ELECTRO_MAX",
+    "r_el": "RAMP_ELECTRO",
+    "eta_electro": "ELECTRO_YIELD",
+    "LHV_H2": "LHV_H2",
+    "H2_target": "H2_TARGET",
+    "SOC_min": "SOC_MIN",
+    "SOC_max": "SOC_MAX",
+    "eta_ch": "ETA_CH",
+    "eta_dis": "ETA_DIS",
+    "dt": "DT",
+}
+
+
+def _ga_parameters(parameters):
+    # Traduit les paramètres vers les noms de code_ines et recalcule ALPHA
+    import Resolution.code_ines as code_ines
+
+    unused = sorted(parameters.keys() - GA_PARAMETERS.keys())
+    if unused:
+        raise KeyError(f"Paramètres non utilisés par la méthode ga : {', '.join(unused)}")
+    parameters = {GA_PARAMETERS[name]: value for name, value in parameters.items()}
+    if {"r", "N_years"} & parameters.keys():
+        r = parameters.get("r", code_ines.r)
+        N = parameters.get("N_years", code_ines.N_years)
+        parameters["ALPHA"] = r * (1 + r)**N / ((1 + r)**N - 1)
+    return parameters, [code_ines]
+
+
+@contextlib.contextmanager
+def override_parameters(parameters, method="lp"):
+    """
+    Surcharge temporaire des constantes du modèle. Les modules du projet les
+    importent par `from Data.constants import *` : chaque copie est remplacée,
+    puis restaurée à la sortie. La méthode ga a ses propres constantes
+    (Resolution/code_ines.py) : les paramètres y sont traduits par GA_PARAMETERS
+    et ceux qu'elle ne lit pas sont refusés.
+    """
+    import Data.constants as constants
+
+    parameters = dict(parameters)
+    if method == "ga":
+        parameters, modules = _ga_parameters(parameters)
+    else:
+        if {"r", "N"} & parameters.keys() and "alpha" not in parameters:
+            r = parameters.get("r", constants.r)
+            N = parameters.get("N", constants.N)
+            parameters["alpha"] = r * (1 + r)**N / ((1 + r)**N - 1)
+        if {"c_bat_E", "cycles_ref", "SOC_min", "SOC_max"} & parameters.keys() and "c_deg" not in parameters:
+            c_bat_E, cycles_ref, SOC_min, SOC_max = (
+                parameters.get(name, getattr(constants, name))
+                for name in ("c_bat_E", "cycles_ref", "SOC_min", "SOC_max")
+            )
+            parameters["c_deg"] = c_bat_E / (cycles_ref * (SOC_max - SOC_min))
+
+        # code_ines a ses propres r / LHV_H2, indépendants de Data.constants
+        modules = [m for name, m in list(sys.modules.items())
+                   if m is not None and name.split(".")[0] in PACKAGES
+                   and name != "Resolution.code_ines"]
+
+    saved = []
+    try:
+        for name, value in parameters.items():
+            found = False
+            for module in modules:
+                if name in vars(module):
+                    saved.append((module, name, getattr(module, name)))
+                    setattr(module, name, value)
+                    found = True
+            if not found:
+                raise KeyError(f"Paramètre inconnu : {name}")
+        yield
+    finally:
+        for module, name, value in reversed(saved):
+            setattr(module, name, value)
+
+
+def _run_lp(price, intensity, dates, solver, options):
+    import pyomo.environ as pyo
+    from Costs.cost_functions import emissions_co2
+    from Resolution.optimisation import dispatch_frame, solve_model
+
+    model, res, lifetime = solve_model(price, solver, **options)
+    term = res.solver.termination_condition
+    if term != pyo.TerminationCondition.optimal:
+        raise RuntimeError(f"Modèle non résolu : {term}")
+
+    dispatch = dispatch_frame(model)
+    return {
+        "P_bat_max": pyo.value(model.P_bat_max),
+        "E_bat_max": pyo.value(model.E_bat_max),
+        "cost": pyo.value(model.Obj),
+        "c_deg": pyo.value(model.c_deg),
+        "h2": float(dispatch["H2"].sum()),
+        "co2": pyo.value(emissions_co2(model, intensity)),
+        "bat_lifetime": lifetime,
+    }, dispatch
+
+
+def _run_ga(price, intensity, dates, solver, options):
+    from Resolution.code_ines import genetic_algorithm
+
+    # le parallélisme est déjà assuré au niveau des jobs
+    options = {"n_workers": 1, **options}
+    bounds = [tuple(b) for b in options.pop("bounds")]
+    best_x, best_f = genetic_algorithm(elec_price=price, bounds=bounds, solver=solver, **options)
+    return {"P_bat_max": float(best_x[0]), "E_bat_max": float(best_x[1]), "cost": float(best_f)}, None
+
+
+def _run_decomposition(price, intensity, dates, solver, options):
+    from Resolution.decomposition import lagrangian_dispatch
+
+    # le parallélisme est déjà assuré au niveau des jobs
+    options = {"n_workers": 1, **options}
+    result = lagrangian_dispatch(price=price, dates=dates, solver=solver, **options)
+    dispatch = result.pop("dispatch")
+    result["lambda"] = {str(k): v for k, v in result["lambda"].items()}
+    result["P_bat_max"] = options["P_bat_max"]
+    result["E_bat_max"] = options["E_bat_max"]
+    return result, dispatch
+
+
+RUNNERS = {"lp": _run_lp, "ga": _run_ga, "decomposition": _run_decomposition}
+
+# modules à importer avant la surcharge des paramètres, pour qu'ils soient restaurés
+MODULES = {
+    "lp": ["Data.loading", "Costs.cost_functions", "Resolution.optimisation"],
+    "ga": ["Data.loading", "Resolution.code_ines"],
+    "decomposition": ["Data.loading", "Resolution.decomposition"],
+}
+
+
+def run_job(job, dispatch_dir=None):
+    """
+    Exécute un job et renvoie son enregistrement de résultats (statut, temps,
+    indicateurs). Les sorties texte des modèles sont capturées dans "log".
+    """
+    record = {k: job[k] for k in ("id", "name", "method", "data", "solver", "parameters", "options")}
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            for name in MODULES[job["method"]]:
+                importlib.import_module(name)
+        with contextlib.redirect_stdout(log), override_parameters(job["parameters"], job["method"]):
+            from Data.loading import loading_function
+
+            price, intensity, _, data = loading_function(job["data"])
+            loaded = time.perf_counter()
+            results, dispatch = RUNNERS[job["method"]](
+                price, intensity, data["Date"], job["solver"], job["options"]
+            )
+        solved = time.perf_counter()
+
+        if dispatch_dir is not None and dispatch is not None:
+            dispatch.insert(0, "Date", data["Date"].to_numpy())
+            dispatch.to_parquet(Path(dispatch_dir) / f"job-{job['id']:05d}.parquet")
+
+        record.update(status="ok", results=results, error=None)
+        record["timings"] = {"load": loaded - start, "solve": solved - loaded}
+    except Exception:
+        record.update(status="error", results=None, error=traceback.format_exc())
+        record["timings"] = {}
+    record["timings"]["total"] = time.perf_counter() - start
+    record["log"] = log.getvalue()
+    return record
+
+
+# ========= 3. ÉCRITURE / FUSION DES RÉSULTATS =========
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+
+def results_table(records):
+    """Une ligne par job, paramètres / résultats / temps aplatis en colonnes."""
+    table = pd.json_normalize(
+        [{k: v for k, v in rec.items() if k not in ("log", "options")} for rec in records],
+        sep=".",
+    )
+    return table.sort_values("id").reset_index(drop=True)
+
+
+def write_results(payload, out, fmt):
+    """Écrit <out>.json et, si demandé, le tableau <out>.parquet."""
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False, default=_to_json)
+    if fmt == "parquet":
+        results_table(payload["results"]).to_parquet(out.with_suffix(".parquet"))
+
+
+def _require_parquet():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise SystemExit("Le format Parquet nécessite le paquet pyarrow")
+
+
+def run(args):
+    if args.format == "parquet" or args.dispatch:
+        _require_parquet()
+    with open(args.scenario, encoding="utf-8") as f:
+        scenario = json.load(f)
+    jobs = expand_scenario(scenario)
+    k, n = args.shard
+    mine = [job for job in jobs if job["id"] % n == k]
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    dispatch_dir = None
+    if args.dispatch:
+        dispatch_dir = out / "dispatch"
+        dispatch_dir.mkdir(exist_ok=True)
+
+    start = time.perf_counter()
+    records = []
+    if args.workers == 1:
+        for job in mine:
+            records.append(run_job(job, dispatch_dir))
+            print(f"[{len(records)}/{len(mine)}] {job['name']} : {records[-1]['status']}", file=sys.stderr)
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(run_job, job, dispatch_dir) for job in mine]
+            for future in as_completed(futures):
+                records.append(future.result())
+                print(f"[{len(records)}/{len(mine)}] {records[-1]['name']} : {records[-1]['status']}",
+                      file=sys.stderr)
+    records.sort(key=lambda rec: rec["id"])
+
+    payload = {
+        "scenario": str(args.scenario),
+        "shard": [k, n],
+        "fingerprint": jobs_fingerprint(jobs),
+        "n_jobs": len(jobs),
+        "wall_time": time.perf_counter() - start,
+        "results": records,
+    }
+    write_results(payload, out / f"results-{k}-of-{n}", args.format)
+    return 0 if all(rec["status"] == "ok" for rec in records) else 1
+
+
+def merge(args):
+    if args.format == "parquet":
+        _require_parquet()
+    files = sorted(Path(args.results).glob("results-*-of-*.json"))
+    if not files:
+        raise SystemExit(f"Aucun fichier results-*-of-*.json dans {args.results}")
+
+    payloads = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            payloads.append(json.load(f))
+
+    # tous les fichiers doivent venir du même scénario, découpé en N shards
+    keys = {(p.get("fingerprint"), p["shard"][1], p["n_jobs"]) for p in payloads}
+    if len(keys) != 1:
+        raise SystemExit(
+            "Les fichiers ne proviennent pas du même scénario ou du même découpage : "
+            + ", ".join(f"{path.name} (N={p['shard'][1]}, empreinte {str(p.get('fingerprint'))[:12]})"
+                        for path, p in zip(files, payloads))
+        )
+    fingerprint, n, total = keys.pop()
+    shards = sorted(p["shard"][0] for p in payloads)
+    if shards != list(range(n)):
+        raise SystemExit(f"Shards attendus : 0..{n - 1} une fois chacun, trouvés : {shards}")
+
+    records = [rec for p in payloads for rec in p["results"]]
+    payload = {
+        "shards": [p.name for p in files],
+        "fingerprint": fingerprint,
+        "n_jobs": total,
+        "total_shard_time": sum(p["wall_time"] for p in payloads),
+        "results": sorted(records, key=lambda rec: rec["id"]),
+    }
+    write_results(payload, Path(args.out).with_suffix(""), args.format)
+    return 0
+
+
+# ========= 4. LIGNE DE COMMANDE =========
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m Resolution.batch", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="exécuter les jobs d'un scénario")
+    p_run.add_argument("scenario", help="fichier de scénario JSON")
+    p_run.add_argument("--out", default="results", help="dossier de sortie")
+    p_run.add_argument("--workers", type=int, default=None,
+                       help="nombre de processus (défaut : tous les cœurs)")
+    p_run.add_argument("--shard", type=parse_shard, default=(0, 1),
+                       help="part K/N de l'étude à traiter (défaut : 0/1)")
+    p_run.add_argument("--format", choices=("json", "parquet"), default="json",
+                       help="parquet : tableau récapitulatif en plus du JSON")
+    p_run.add_argument("--dispatch", action="store_true",
+                       help="écrire le dispatch horaire de chaque job (Parquet)")
+    p_run.set_defaults(func=run)
+
+    p_merge = sub.add_parser("merge", help="fusionner les résultats des shards")
+    p_merge.add_argument("results", help="dossier contenant les results-K-of-N.json")
+    p_merge.add_argument("--out", default="merged.json", help="fichier fusionné")
+    p_merge.add_argument("--format", choices=("json", "parquet"), default="json")
+    p_merge.set_defaults(func=merge)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
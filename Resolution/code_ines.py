@@ -14,7 +14,8 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-import random
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pyomo.environ as pyo
 
@@ -45,7 +46,7 @@ DT = 1.0                   # h
  
 # ========= 1. PROBLÈME LOCAL (Pyomo) =========
  
-def local_cost(P_bat_max: float, E_bat_max: float, elec_price) -> float:
+def local_cost(P_bat_max: float, E_bat_max: float, elec_price, solver: str = "glpk") -> float:
     """
     Problème local de dispatch sur l'horizon :
       - variables : P_spot[t], P_electro[t], P_ch[t], P_dis[t], SOC[t], H2[t]
@@ -60,6 +61,8 @@ def local_cost(P_bat_max: float, E_bat_max: float, elec_price) -> float:
         Capacité énergétique de la batterie [MWh].
     elec_price : dict ou array-like
         Prix de l'électricité par pas de temps (€/MWh).
+    solver : str
+        Nom du solveur Pyomo.
  
     Retour
     ------
@@ -167,9 +170,8 @@ def local_cost(P_bat_max: float, E_bat_max: float, elec_price) -> float:
     m.Obj = pyo.Objective(expr=capex_annuel + cout_elec, sense=pyo.minimize)
  
     # ---------- Résolution ----------
-    solver = pyo.SolverFactory("glpk")
     try:
-        res = solver.solve(m, tee=False)
+        res = pyo.SolverFactory(solver).solve(m, tee=False)
     except Exception:
         # si le solveur plante, on renvoie une grosse pénalité
         return 1e15
@@ -187,16 +189,91 @@ def local_cost(P_bat_max: float, E_bat_max: float, elec_price) -> float:
  
 # ========= 2. FITNESS POUR LE GA =========
  
-def fitness(candidate, elec_price):
+def fitness(candidate, elec_price, solver="glpk"):
     """
     candidate = [P_bat_max, E_bat_max]
     """
     P_bat_max, E_bat_max = candidate
-    return local_cost(P_bat_max, E_bat_max, elec_price)
+    return local_cost(P_bat_max, E_bat_max, elec_price, solver)
  
  
 # ========= 3. ALGorithme GÉNÉTIQUE =========
  
+def _evaluate(population, cache, elec_price, solver):
+    """
+    Fitness de chaque ligne de population ; les individus déjà évalués
+    (copies sans croisement ni mutation) sont lus dans le cache.
+    """
+    values = np.empty(len(population))
+    for i, ind in enumerate(population):
+        key = tuple(ind)
+        if key not in cache:
+            cache[key] = fitness(ind, elec_price, solver)
+        values[i] = cache[key]
+    return values
+ 
+ 
+def _evolve_island(island, elec_price, bounds, n_gens, p_crossover, p_mutation, solver, k=3):
+    """
+    Fait évoluer une île pendant n_gens générations (exécuté dans un processus
+    du pool). Population (pop_size, n_vars) en tableau NumPy : sélection,
+    croisement et mutation sont faits pour toute la génération d'un coup.
+ 
+    island = {"pop", "fit", "rng", "cache"} ; "fit" vaut None avant la
+    première évaluation. Retourne l'île et le meilleur coût de chaque génération.
+    """
+    lo, hi = bounds[:, 0], bounds[:, 1]
+    rng, cache = island["rng"], island["cache"]
+    pop = island["pop"]
+    fit = island["fit"]
+    if fit is None:
+        fit = _evaluate(pop, cache, elec_price, solver)
+ 
+    pop_size, n_vars = pop.shape
+    n_pairs = pop_size // 2  # le meilleur est conservé (élitisme)
+    sigma = 0.1 * (hi - lo)
+    history = []
+ 
+    for _ in range(n_gens):
+        # Sélection par tournoi : k candidats tirés pour chaque parent
+        cand = rng.integers(0, pop_size, size=(2 * n_pairs, k))
+        winners = cand[np.arange(2 * n_pairs), np.argmin(fit[cand], axis=1)]
+        p1, p2 = pop[winners[:n_pairs]], pop[winners[n_pairs:]]
+ 
+        # Croisement arithmétique
+        a = rng.random((n_pairs, 1))
+        cross = rng.random((n_pairs, 1)) < p_crossover
+        c1 = np.where(cross, a * p1 + (1 - a) * p2, p1)
+        c2 = np.where(cross, (1 - a) * p1 + a * p2, p2)
+        children = np.concatenate([c1, c2])[: pop_size - 1]
+ 
+        # Mutation gaussienne, ramenée dans les bornes
+        mutate = rng.random(children.shape) < p_mutation
+        children = children + mutate * rng.normal(0.0, sigma, children.shape)
+        children = np.clip(children, lo, hi)
+ 
+        best = np.argmin(fit)
+        pop = np.concatenate([pop[best:best + 1], children])
+        fit = np.concatenate([fit[best:best + 1], _evaluate(children, cache, elec_price, solver)])
+        history.append(fit.min())
+ 
+    island = {"pop": pop, "fit": fit, "rng": rng, "cache": cache}
+    return island, history
+ 
+ 
+def _migrate(islands, n_migrants):
+    """Migration en anneau : les meilleurs de l'île i remplacent les pires de l'île i+1."""
+    migrants = []
+    for island in islands:
+        best = np.argsort(island["fit"])[:n_migrants]
+        migrants.append((island["pop"][best].copy(), island["fit"][best].copy()))
+    for i, island in enumerate(islands):
+        pop, fit = migrants[i - 1]
+        worst = np.argsort(island["fit"])[-n_migrants:]
+        island["pop"][worst] = pop
+        island["fit"][worst] = fit
+ 
+ 
 def genetic_algorithm(
     elec_price,
     bounds,
@@ -205,80 +282,91 @@ def genetic_algorithm(
     p_crossover=0.8,
     p_mutation=0.2,
     rng_seed=42,
+    solver="glpk",
+    n_islands=1,
+    migration_interval=5,
+    n_migrants=1,
+    patience=None,
+    tol=0.0,
+    n_workers=None,
 ):
     """
     Algorithme génétique continu sur 2 variables :
       x = [P_bat_max, E_bat_max]
  
     bounds = [(P_min, P_max), (E_min, E_max)]
-    """
-    random.seed(rng_seed)
-    np.random.seed(rng_seed)
-    n_vars = len(bounds)
  
-    def random_candidate():
-        return [
-            random.uniform(bounds[i][0], bounds[i][1]) for i in range(n_vars)
-        ]
+    Modèle en îles : n_islands populations de pop_size individus évoluent en
+    parallèle (un processus par île, n_workers au plus) et échangent leurs
+    n_migrants meilleurs individus toutes les migration_interval générations.
  
-    # Population initiale
-    population = [random_candidate() for _ in range(pop_size)]
-    fitness_values = [fitness(ind, elec_price) for ind in population]
- 
-    # Sélection par tournoi
-    def tournament_selection(k=3):
-        idxs = random.sample(range(pop_size), k)
-        best_idx = min(idxs, key=lambda i: fitness_values[i])
-        return population[best_idx][:]
- 
-    # Croisement
-    def crossover(p1, p2):
-        if random.random() > p_crossover:
-            return p1[:], p2[:]
-        alpha = random.random()
-        c1 = [alpha * p1[i] + (1 - alpha) * p2[i] for i in range(n_vars)]
-        c2 = [(1 - alpha) * p1[i] + alpha * p2[i] for i in range(n_vars)]
-        return c1, c2
- 
-    # Mutation
-    def mutate(ind):
-        for i in range(n_vars):
-            if random.random() < p_mutation:
-                sigma = 0.1 * (bounds[i][1] - bounds[i][0])
-                ind[i] += random.gauss(0, sigma)
-                ind[i] = max(bounds[i][0], min(bounds[i][1], ind[i]))
- 
-    # Boucle GA
-    for gen in range(n_generations):
-        new_pop = []
- 
-        # Élitisme : on garde le meilleur
-        best_idx = int(np.argmin(fitness_values))
-        best_ind = population[best_idx][:]
-        best_fit = fitness_values[best_idx]
-        new_pop.append(best_ind)
- 
-        while len(new_pop) < pop_size:
-            p1 = tournament_selection()
-            p2 = tournament_selection()
-            c1, c2 = crossover(p1, p2)
-            mutate(c1)
-            mutate(c2)
-            new_pop.append(c1)
-            if len(new_pop) < pop_size:
-                new_pop.append(c2)
- 
-        population = new_pop[:pop_size]
-        fitness_values = [fitness(ind, elec_price) for ind in population]
- 
-        print(
-            f"Génération {gen+1}/{n_generations} - "
-            f"meilleur coût = {min(fitness_values):.2f}"
-        )
+    Arrêt anticipé : si patience est donné, l'algorithme s'arrête quand le
+    meilleur coût ne s'est pas amélioré de plus de tol (relatif) pendant
+    patience générations.
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    lo, hi = bounds[:, 0], bounds[:, 1]
+    seeds = np.random.SeedSequence(rng_seed).spawn(n_islands)
  
-    best_idx = int(np.argmin(fitness_values))
-    best_candidate = population[best_idx]
-    best_cost = fitness_values[best_idx]
+    # Population initiale
+    islands = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        pop = rng.uniform(lo, hi, size=(pop_size, len(bounds)))
+        islands.append({"pop": pop, "fit": None, "rng": rng, "cache": {}})
+ 
+    # Une seule île : pas de migration, on vérifie l'arrêt à chaque génération
+    epoch = migration_interval if n_islands > 1 else 1
+    pool = ProcessPoolExecutor(max_workers=n_workers) if n_islands > 1 and n_workers != 1 else None
+ 
+    best_history = []
+    stall = 0
+    gen = 0
+    since_migration = 0
+    try:
+        while gen < n_generations:
+            # l'époque s'arrête avant la migration si la patience peut être
+            # épuisée plus tôt : l'arrêt tombe sur la génération exacte
+            n_gens = min(epoch - since_migration, n_generations - gen)
+            if patience is not None:
+                n_gens = min(n_gens, max(patience - stall, 1))
+            args = (elec_price, bounds, n_gens, p_crossover, p_mutation, solver)
+            if pool is not None:
+                futures = [pool.submit(_evolve_island, island, *args) for island in islands]
+                outcomes = [f.result() for f in futures]
+            else:
+                outcomes = [_evolve_island(island, *args) for island in islands]
+            islands = [island for island, _ in outcomes]
+ 
+            since_migration += n_gens
+            for best_cost in np.min([history for _, history in outcomes], axis=0):
+                gen += 1
+                if best_history and best_cost < best_history[-1] - tol * abs(best_history[-1]):
+                    stall = 0
+                elif best_history:
+                    stall += 1
+                best_history.append(min(best_cost, best_history[-1]) if best_history else best_cost)
+                print(
+                    f"Génération {gen}/{n_generations} - "
+                    f"meilleur coût = {best_history[-1]:.2f}"
+                )
+ 
+            if patience is not None and stall >= patience:
+                print(f"Arrêt anticipé : pas d'amélioration depuis {stall} générations")
+                break
+ 
+            if since_migration >= epoch:
+                if n_islands > 1 and gen < n_generations:
+                    _migrate(islands, n_migrants)
+                since_migration = 0
+    finally:
+        if pool is not None:
+            pool.shutdown()
+ 
+    best_island = min(islands, key=lambda island: island["fit"].min())
+    best_idx = int(np.argmin(best_island["fit"]))
+    best_candidate = best_island["pop"][best_idx].tolist()
+    best_cost = float(best_island["fit"][best_idx])
     return best_candidate, best_cost
  
  
@@ -314,7 +402,7 @@ if __name__ == "__main__":
         (0.0, 200.0),  # E_bat_max entre 0 et 200 MWh (à ajuster)
 
     ]
- 
+
     # 5) Lancer l'algorithme génétique
 
     best_x, best_f = genetic_algorithm(
@@ -333,6 +421,10 @@ if __name__ == "__main__":
 
         rng_seed=123,
 
+        n_islands=2,       # îles évoluant en parallèle
+
+        patience=5,        # arrêt après 5 générations sans amélioration
+
     )
  
     print("\n=== Résultat final du GA ===")
@@ -0,0 +1,367 @@
+"""
+Décomposition lagrangienne du dispatch annuel (batterie dimensionnée fixée).
+
+La contrainte h2_target_rule couple toutes les heures de l'année. On la relâche
+avec un multiplicateur lambda (prix fictif du H2, en €/kg) :
+
+    min  sum_t price[t] * P_spot[t] * dt - lambda * (sum_t H2[t] - H2_target)
+
+Pour lambda fixé, le problème se sépare en sous-problèmes mensuels (ou
+hebdomadaires) indépendants dès que le SOC est imposé aux frontières entre
+périodes. Les sous-problèmes sont construits une seule fois, répartis entre des
+processus qui les gardent en mémoire avec leur solveur persistant, et seul
+lambda change d'une itération à l'autre. lambda est ajusté par une sécante
+encadrée (regula falsi) jusqu'à atteindre la cible annuelle.
+
+- Une cible (et un lambda) par année civile : un horizon pluriannuel se
+  décompose de la même façon, chaque année ayant sa propre recherche de lambda.
+- La solution finale est la combinaison convexe des solutions encadrantes
+  (lambda_bas, lambda_haut) qui atteint exactement la cible.
+- Le SOC étant imposé à soc_boundary * E_bat_max à chaque frontière, la borne
+  duale ("dual_bound_fixed_soc") ne minore que ce problème restreint, pas le LP
+  annuel : elle peut dépasser l'optimum de optimisation.py.
+- Résolue séquentiellement, la décomposition est plus lente que le LP annuel
+  (près de deux fois sur une année en mensuel) : elle n'est intéressante que
+  répartie sur plusieurs processus.
+- Les rampes de l'électrolyseur ne sont pas imposées à la première heure de
+  chaque période.
+"""
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyo
+
+from Data.constants import *
+from Data.loading import df, price_elec
+from Battery.battery_simulation import *
+from Electrolyser.electrolyser_simulation import *
+from Costs.cost_functions import capex_annual, cout_degradation, cout_elec
+
+VARIABLES = ["P_spot", "P_ch", "P_dis", "P_electro", "SOC", "H2"]
+
+
+# ========= 1. DÉCOUPAGE DE L'HORIZON =========
+
+def split_horizon(dates, freq="M"):
+    """
+    Découpe l'horizon en périodes contiguës ("M" : mois, "W" : semaine, ...).
+    Les périodes sont aussi coupées au changement d'année civile (une semaine
+    à cheval donne deux périodes) : chacune relève d'une seule cible annuelle.
+    Retourne une liste de couples (début, fin) d'indices, fin exclue.
+    """
+    dates = pd.to_datetime(pd.Series(dates))
+    labels = dates.dt.to_period(freq).to_numpy()
+    years = dates.dt.year.to_numpy()
+    cuts = np.flatnonzero((labels[1:] != labels[:-1]) | (years[1:] != years[:-1])) + 1
+    edges = np.concatenate(([0], cuts, [len(labels)]))
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+# ========= 2. SOUS-PROBLÈME D'UNE PÉRIODE =========
+
+def build_subproblem(price, P_bat_max, E_bat_max, soc_start, soc_end):
+    """
+    Dispatch d'une période avec la cible H2 relâchée au prix m.lam (€/kg).
+    Le SOC est imposé au début de la période et après sa dernière heure.
+    m.lam est un Param mutable : le modèle est construit une seule fois et
+    seul l'objectif change d'une itération à l'autre.
+    """
+    m = pyo.ConcreteModel()
+    m.T = pyo.RangeSet(0, len(price) - 1)
+    m.lam = pyo.Param(mutable=True, initialize=0.0)
+
+    m.P_bat_max = pyo.Var(domain=pyo.NonNegativeReals)
+    m.E_bat_max = pyo.Var(domain=pyo.NonNegativeReals)
+    m.P_bat_max.fix(P_bat_max)
+    m.E_bat_max.fix(E_bat_max)
+
+    m.P_spot = pyo.Var(m.T, domain=pyo.Reals)
+    m.P_ch = pyo.Var(m.T, domain=pyo.NonNegativeReals)
+    m.P_dis = pyo.Var(m.T, domain=pyo.NonNegativeReals)
+    m.P_electro = pyo.Var(m.T, domain=pyo.NonNegativeReals)
+    m.SOC = pyo.Var(m.T, domain=pyo.NonNegativeReals)
+    m.H2 = pyo.Var(m.T, domain=pyo.NonNegativeReals)
+
+    m.PowerBalance = pyo.Constraint(m.T, rule=power_balance_rule)
+    m.SOCdyn = pyo.Constraint(m.T, rule=soc_dyn_rule)
+    m.SOCLowerBound = pyo.Constraint(m.T, rule=soc_lower_bound_rule)
+    m.SOCUpperBound = pyo.Constraint(m.T, rule=soc_upper_bound_rule)
+    m.PchLimit = pyo.Constraint(m.T, rule=p_ch_limit_rule)
+    m.PdisLimit = pyo.Constraint(m.T, rule=p_dis_limit_rule)
+    m.ElMin = pyo.Constraint(m.T, rule=el_min_rule)
+    m.ElMax = pyo.Constraint(m.T, rule=el_max_rule)
+    m.ElRamp = pyo.Constraint(m.T, rule=el_ramp_rule)
+    m.H2Production = pyo.Constraint(m.T, rule=h2_production_rule)
+
+    # Conditions aux frontières : SOC imposé au début et à la fin de la période
+    first, last = m.T.first(), m.T.last()
+    m.SOCStart = pyo.Constraint(expr=m.SOC[first] == soc_start)
+    m.SOCEnd = pyo.Constraint(
+        expr=m.SOC[last] + eta_ch * m.P_ch[last] * dt - m.P_dis[last] / eta_dis * dt == soc_end
+    )
+
+    m.Obj = pyo.Objective(
+        expr=cout_elec(m, price) + cout_degradation(m) - m.lam * sum(m.H2[t] for t in m.T),
+        sense=pyo.minimize,
+    )
+    return m
+
+
+# Sous-problèmes détenus par le processus courant : {période: (modèle, solveur)}
+_SUBPROBLEMS = {}
+
+def solve_subproblems(tasks):
+    """
+    Résout les sous-problèmes détenus par ce processus pour de nouveaux lambda.
+    task = (p, lam, data) ; data = (price, P_bat_max, E_bat_max, soc_start,
+    soc_end, solver) n'est transmis qu'au premier appel, qui construit le modèle
+    et son solveur persistant. Les appels suivants ne modifient que lambda.
+    """
+    sols = {}
+    for p, lam, data in tasks:
+        if data is not None:
+            price, P_bat_max, E_bat_max, soc_start, soc_end, solver = data
+            m = build_subproblem(price, P_bat_max, E_bat_max, soc_start, soc_end)
+            _SUBPROBLEMS[p] = (m, pyo.SolverFactory(solver))
+        m, opt = _SUBPROBLEMS[p]
+        m.lam.set_value(lam)
+        res = opt.solve(m, tee=False)
+
+        if data is not None:
+            # solveur persistant : seul l'objectif change ensuite, inutile de
+            # rescanner le modèle (réglage à faire après le premier solve)
+            auto = getattr(getattr(opt, "config", None), "auto_updates", None)
+            if auto is not None:
+                for option in auto:
+                    setattr(auto, option, option in ("update_parameters", "update_objective"))
+
+        term = res.solver.termination_condition
+        if term != pyo.TerminationCondition.optimal:
+            raise RuntimeError(f"Sous-problème non résolu : {term}")
+
+        sol = {
+            name: np.array([v.value for v in getattr(m, name).values()])
+            for name in VARIABLES
+        }
+        sol["obj"] = pyo.value(m.Obj)
+        sols[p] = sol
+    return sols
+
+
+# ========= 3. COORDINATION PAR LE PRIX DU H2 =========
+
+def lagrangian_dispatch(
+    P_bat_max,
+    E_bat_max,
+    price=price_elec,
+    dates=None,
+    freq="M",
+    soc_boundary=0.5,
+    h2_target=None,
+    solver="highs",
+    n_workers=None,
+    tol=1e-4,
+    max_iter=60,
+):
+    """
+    Dispatch annuel par décomposition lagrangienne.
+
+    Paramètres
+    ----------
+    P_bat_max, E_bat_max : float
+        Dimensionnement de la batterie [MW], [MWh].
+    price : array-like
+        Prix de l'électricité par pas de temps (€/MWh).
+    dates : array-like
+        Horodatage des pas de temps (par défaut la colonne Date des données).
+    freq : str
+        Période des sous-problèmes ("M" : mois, "W" : semaine). Le nombre de
+        processus utiles est limité au nombre de périodes.
+    soc_boundary : float
+        SOC imposé aux frontières entre périodes (fraction de E_bat_max).
+    h2_target : float
+        Objectif annuel de production H2 (kg), appliqué à chaque année civile
+        (par défaut H2_target).
+    n_workers : int
+        Nombre de processus (None : tous les cœurs, 1 : résolution séquentielle).
+    tol : float
+        Tolérance relative sur lambda pour arrêter la recherche.
+
+    Retour
+    ------
+    dict : multiplicateurs par année, production H2, coût total (cout_total),
+           borne duale à SOC imposé aux frontières, durée de vie batterie en cyclage et dispatch horaire
+           (DataFrame).
+    """
+    if dates is None:
+        dates = df["Date"]
+    if h2_target is None:
+        h2_target = H2_target
+    if not SOC_min <= soc_boundary <= SOC_max:
+        raise ValueError("soc_boundary doit être compris entre SOC_min et SOC_max")
+
+    price = np.asarray(price, dtype=float)
+    periods = split_horizon(dates, freq)
+    years = pd.to_datetime(pd.Series(dates)).dt.year.to_numpy()
+    period_year = np.array([years[start] for start, _ in periods])
+    year_list = np.unique(period_year)
+    year_idx = np.searchsorted(year_list, period_year)
+    n_years = len(year_list)
+
+    soc0 = soc_boundary * E_bat_max
+
+    # Au-delà de lam_hi, chaque kg produit rapporte plus que l'électricité consommée
+    kwh_per_kg = LHV_H2 / (1000.0 * eta_electro)
+    lam_lo = np.zeros(n_years)
+    lam_hi = np.full(n_years, max(price.max(), 0.0) * kwh_per_kg + 1.0)
+
+    # Chaque période est attachée à un processus qui garde son modèle entre les itérations
+    n_procs = min(n_workers or os.cpu_count() or 1, len(periods))
+    owners = [ProcessPoolExecutor(max_workers=1) for _ in range(n_procs)] if n_procs > 1 else []
+    built = set()
+    _SUBPROBLEMS.clear()
+
+    def solve(lam, active):
+        # Résout les périodes des années actives pour les multiplicateurs lam
+        batches = [[] for _ in range(max(n_procs, 1))]
+        for p, (start, stop) in enumerate(periods):
+            if not active[year_idx[p]]:
+                continue
+            data = None
+            if p not in built:
+                data = (price[start:stop], P_bat_max, E_bat_max, soc0, soc0, solver)
+                built.add(p)
+            batches[p % len(batches)].append((p, lam[year_idx[p]], data))
+        if owners:
+            futures = [owner.submit(solve_subproblems, batch) for owner, batch in zip(owners, batches)]
+            results = [f.result() for f in futures]
+        else:
+            results = [solve_subproblems(batches[0])]
+        return {p: sol for sols in results for p, sol in sols.items()}
+
+    def h2_per_year(sols):
+        h2 = np.zeros(n_years)
+        for p, sol in sols.items():
+            h2[year_idx[p]] += sol["H2"].sum()
+        return h2
+
+    try:
+        every_year = np.ones(n_years, dtype=bool)
+        sol_lo = solve(lam_lo, every_year)
+        h2_lo = h2_per_year(sol_lo)
+        sol_hi = solve(lam_hi, every_year)
+        h2_hi = h2_per_year(sol_hi)
+
+        if np.any(h2_hi < h2_target):
+            raise ValueError(
+                f"Objectif H2 inatteignable : production maximale {h2_hi.min():.0f} kg"
+            )
+
+        # Cible non contraignante : lambda = 0
+        binding = h2_lo < h2_target
+        lam_hi[~binding] = 0.0
+        for p in range(len(periods)):
+            if not binding[year_idx[p]]:
+                sol_hi[p] = sol_lo[p]
+        h2_hi[~binding] = h2_lo[~binding]
+
+        # Sécante encadrée (regula falsi, variante Illinois) sur H2(lambda) - cible :
+        # f_lo < 0 <= f_hi, f est divisé par 2 du côté qui n'a pas bougé deux fois de suite
+        f_lo = h2_lo - h2_target
+        f_hi = h2_hi - h2_target
+        last_side = np.zeros(n_years)
+
+        n_iter = 0
+        for n_iter in range(1, max_iter + 1):
+            active = binding & (lam_hi - lam_lo > tol * np.maximum(lam_hi, 1.0))
+            if not active.any():
+                break
+
+            width = lam_hi - lam_lo
+            lam_new = lam_lo - f_lo * width / np.where(f_hi > f_lo, f_hi - f_lo, 1.0)
+            # on reste à l'intérieur de l'intervalle pour garantir sa réduction
+            lam_new = np.clip(lam_new, lam_lo + 0.01 * width, lam_hi - 0.01 * width)
+            sol_new = solve(lam_new, active)
+            h2_new = h2_per_year(sol_new)
+
+            up = active & (h2_new >= h2_target)
+            down = active & (h2_new < h2_target)
+            lam_hi[up], h2_hi[up], f_hi[up] = lam_new[up], h2_new[up], h2_new[up] - h2_target
+            lam_lo[down], h2_lo[down], f_lo[down] = lam_new[down], h2_new[down], h2_new[down] - h2_target
+            f_lo[up & (last_side == 1)] *= 0.5
+            f_hi[down & (last_side == -1)] *= 0.5
+            last_side[up], last_side[down] = 1, -1
+            for p, sol in sol_new.items():
+                if up[year_idx[p]]:
+                    sol_hi[p] = sol
+                else:
+                    sol_lo[p] = sol
+
+            print(
+                f"Itération {n_iter} - "
+                + ", ".join(
+                    f"{year_list[y]} : lambda = {lam_new[y]:.4f} €/kg, H2 = {h2_new[y]:.0f} kg"
+                    for y in np.flatnonzero(active)
+                )
+            )
+    finally:
+        for owner in owners:
+            owner.shutdown()
+        _SUBPROBLEMS.clear()
+
+    # Combinaison convexe des solutions encadrantes pour atteindre la cible
+    theta = np.ones(n_years)
+    gap = h2_hi - h2_lo
+    mix = binding & (gap > 0)
+    theta[mix] = (h2_target - h2_lo[mix]) / gap[mix]
+
+    dispatch = {name: np.empty(len(price)) for name in VARIABLES}
+    dual_bound = 0.0    # borne du problème à SOC imposé aux frontières
+    for p, (start, stop) in enumerate(periods):
+        w = theta[year_idx[p]]
+        for name in VARIABLES:
+            dispatch[name][start:stop] = w * sol_hi[p][name] + (1 - w) * sol_lo[p][name]
+        dual_bound += sol_hi[p]["obj"]
+    dual_bound += float(np.sum(lam_hi * h2_target))
+
+    lifetime = battery_lifetime(dispatch["SOC"], E_bat_max)
+    capex = capex_annual(SimpleNamespace(P_bat_max=P_bat_max, E_bat_max=E_bat_max))
+    elec = float(np.sum(price * dispatch["P_spot"] * dt))
+    wear = float(np.sum(c_deg * dispatch["P_dis"] * dt)) if degradation else 0.0
+
+    return {
+        "lambda": dict(zip(year_list.tolist(), lam_hi.tolist())),
+        "h2": float(dispatch["H2"].sum()),
+        "cost": capex + elec + wear,
+        "dual_bound_fixed_soc": capex + dual_bound,
+        "iterations": n_iter,
+        "bat_lifetime": lifetime,
+        "dispatch": pd.DataFrame(dispatch, index=pd.Index(range(len(price)))),
+    }
+
+
+# ========= 4. EXEMPLE D'UTILISATION =========
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    result = lagrangian_dispatch(P_bat_max=20.0, E_bat_max=80.0, freq="M")
+    elapsed = time.perf_counter() - start
+
+    print("\n=== Résultat de la décomposition ===")
+    for year, lam in result["lambda"].items():
+        print(f"Prix du H2 ({year})            : {lam:.4f} €/kg")
+    print(f"Production H2 (kg)           : {result['h2']:.0f}")
+    print(f"Coût total annuel (€)        : {result['cost']:.2f}")
+    print(f"Borne duale, SOC imposé (€)  : {result['dual_bound_fixed_soc']:.2f}")
+    print(f"Temps de résolution (s)      : {elapsed:.1f}")
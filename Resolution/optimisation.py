@@ -11,7 +11,6 @@ print("PROJECT_ROOT =", PROJECT_ROOT)
 import pyomo.environ as pyo
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
 from Data.constants import *
 from Data.loading import *
@@ -19,49 +18,91 @@ from Battery.battery_simulation import *
 from Electrolyser.electrolyser_simulation import *
 from Costs.cost_functions import *
 
-model = pyo.ConcreteModel()
+def build_model(price=price_elec):
+    """
+    Modèle de dimensionnement (batterie + dispatch) sur l'horizon de price.
+    model.c_deg : coût de cyclage (€/MWh déchargé), Param mutable recalé par solve_model.
+    """
+    model = pyo.ConcreteModel()
+
+    # ---- Sets ----
+    model.T = pyo.RangeSet(0, len(price)-1)   # on utilise 0..T-1 pour faciliter les indices
+    # Pour les contraintes de rampe, on utilisera 1..T-1
+
+    # ---- Variables de dimensionnement ----
+    model.P_bat_max = pyo.Var(domain=pyo.NonNegativeReals)  # Puissance installée batterie MW
+    model.E_bat_max = pyo.Var(domain=pyo.NonNegativeReals)  # Capacité énergétique de la batterie MWh
+    # model.phi = pyo.Var(domain=pyo.UnitInterval)            # fraction de la puissance de l'électrolyseur acheté sur le forward
+
+
+    # ---- Variables opérationnelles ----
+    # model.P_spot = pyo.Var(model.T, domain=pyo.NonNegativeReals)  # Puissance tirée au prix spot (Achat Uniquement)
+    model.P_spot = pyo.Var(model.T, domain=pyo.Reals)               # Achat Autoriser
+
+    model.P_ch   = pyo.Var(model.T, domain=pyo.NonNegativeReals)    # Puissance de charge de la batterie
+    model.P_dis  = pyo.Var(model.T, domain=pyo.NonNegativeReals)    # Puissance de décharge de la batterie
+    model.P_electro   = pyo.Var(model.T, domain=pyo.NonNegativeReals)   # Puissance de l'électrolyseur
+
+    model.SOC = pyo.Var(model.T, domain=pyo.NonNegativeReals)         # État de charge de la batterie en MWh
+    model.H2 = pyo.Var(model.T, domain=pyo.NonNegativeReals)          # production de H2 (kg)
+
+    model.PowerBalance = pyo.Constraint(model.T, rule=power_balance_rule)
+    model.SOCdyn = pyo.Constraint(model.T, rule=soc_dyn_rule)
+    model.SOCLowerBound = pyo.Constraint(model.T, rule=soc_lower_bound_rule)
+    model.SOCUpperBound = pyo.Constraint(model.T, rule=soc_upper_bound_rule)
+    model.PchLimit = pyo.Constraint(model.T, rule=p_ch_limit_rule)
+    model.PdisLimit = pyo.Constraint(model.T, rule=p_dis_limit_rule)
+    model.PbatMax = pyo.Constraint(rule=p_bat_max)
+    model.EbatMax = pyo.Constraint(rule=e_bat_max)
+    model.ElMin = pyo.Constraint(model.T, rule=el_min_rule)
+    model.ElMax = pyo.Constraint(model.T, rule=el_max_rule)
+    model.ElRamp = pyo.Constraint(model.T, rule=el_ramp_rule)
+    model.H2Production = pyo.Constraint(model.T, rule=h2_production_rule)
+    model.H2Target = pyo.Constraint(rule=h2_target_rule)
+    model.c_deg = pyo.Param(mutable=True, initialize=c_deg)
+    model.Obj = pyo.Objective(expr=cout_total(model, price, model.c_deg), sense=pyo.minimize)
+    return model
+
+
+def solve_model(price=price_elec, solver="highs", tee=False, max_iter=5, tol=0.01):
+    """
+    Construit et résout le modèle. Avec degradation, le coût de cyclage
+    model.c_deg est recalé sur le dommage rainflow du SOC (wear_cost) et le
+    modèle est re-résolu jusqu'à stabilisation (le modèle reste linéaire).
+    model.Obj est donc le coût total annuel déclaré.
+    Retourne (model, result, durée de vie batterie en cyclage en années).
+    """
+    model = build_model(price)
+    for it in range(max_iter):
+        result = pyo.SolverFactory(solver).solve(model, tee=tee)
+        if result.solver.termination_condition != pyo.TerminationCondition.optimal:
+            return model, result, None
+
+        soc = [pyo.value(model.SOC[t]) for t in model.T]
+        if not degradation:
+            break
+        p_dis = [pyo.value(model.P_dis[t]) for t in model.T]
+        cost = pyo.value(model.c_deg)
+        new_cost = wear_cost(soc, p_dis, pyo.value(model.E_bat_max))
+        if abs(new_cost - cost) <= tol * cost:
+            break
+        if it == max_iter - 1:
+            print(
+                f"Coût de cyclage non convergé après {max_iter} résolutions : "
+                f"{cost:.2f} €/MWh dans l'objectif, {new_cost:.2f} €/MWh au dernier dispatch"
+            )
+            break
+        model.c_deg.set_value(new_cost)
+    return model, result, battery_lifetime(soc, pyo.value(model.E_bat_max))
+
+
+def dispatch_frame(model):
+    """Sorties horaires du modèle résolu sous forme de DataFrame."""
+    return pd.DataFrame({
+        name: [pyo.value(getattr(model, name)[t]) for t in model.T]
+        for name in ["P_spot", "P_ch", "P_dis", "P_electro", "SOC", "H2"]
+    })
 
-# ---- Sets ----
-model.T = pyo.RangeSet(0, T-1)   # on utilise 0..T-1 pour faciliter les indices
-# Pour les contraintes de rampe, on utilisera 1..T-1
-
-# ---- Variables de dimensionnement ----
-model.P_bat_max = pyo.Var(domain=pyo.NonNegativeReals)  # Puissance installée batterie MW
-model.E_bat_max = pyo.Var(domain=pyo.NonNegativeReals)  # Capacité énergétique de la batterie MWh
-# model.phi = pyo.Var(domain=pyo.UnitInterval)            # fraction de la puissance de l'électrolyseur acheté sur le forward
-
-
-# ---- Variables opérationnelles ----
-# model.P_spot = pyo.Var(model.T, domain=pyo.NonNegativeReals)  # Puissance tirée au prix spot (Achat Uniquement)
-model.P_spot = pyo.Var(model.T, domain=pyo.Reals)               # Achat Autoriser
-
-model.P_ch   = pyo.Var(model.T, domain=pyo.NonNegativeReals)    # Puissance de charge de la batterie
-model.P_dis  = pyo.Var(model.T, domain=pyo.NonNegativeReals)    # Puissance de décharge de la batterie
-model.P_electro   = pyo.Var(model.T, domain=pyo.NonNegativeReals)   # Puissance de l'électrolyseur
-
-model.SOC = pyo.Var(model.T, domain=pyo.NonNegativeReals)         # État de charge de la batterie en MWh
-model.H2 = pyo.Var(model.T, domain=pyo.NonNegativeReals)          # production de H2 (kg)
-
-model.PowerBalance = pyo.Constraint(model.T, rule=power_balance_rule)
-model.SOCdyn = pyo.Constraint(model.T, rule=soc_dyn_rule)
-model.SOCLowerBound = pyo.Constraint(model.T, rule=soc_lower_bound_rule)
-model.SOCUpperBound = pyo.Constraint(model.T, rule=soc_upper_bound_rule)
-model.PchLimit = pyo.Constraint(model.T, rule=p_ch_limit_rule)
-model.PdisLimit = pyo.Constraint(model.T, rule=p_dis_limit_rule)
-model.PbatMax = pyo.Constraint(rule=p_bat_max)
-model.EbatMax = pyo.Constraint(rule=e_bat_max)
-model.ElMin = pyo.Constraint(model.T, rule=el_min_rule)
-model.ElMax = pyo.Constraint(model.T, rule=el_max_rule)
-model.ElRamp = pyo.Constraint(model.T, rule=el_ramp_rule)
-model.H2Production = pyo.Constraint(model.T, rule=h2_production_rule)
-model.H2Target = pyo.Constraint(rule=h2_target_rule)
-model.Obj = pyo.Objective(rule=objective_rule, sense=pyo.minimize)
-
-solver = pyo.SolverFactory("highs")
-
-result = solver.solve(model, tee=True)
-
-print(result.solver.status, result.solver.termination_condition)
 
 def fmt(x):
     """Format compact pour grands nombres : 1.2M, 7.5k, 9.3B ou 123.45."""
@@ -78,73 +119,79 @@ def fmt(x):
     else:
         return f"{x:.2f}"
 
-# === 📥 PARAMÈTRES D'ENTRÉE ===
-RES_MAX_PWR_ELECTRO      = P_electro_max
-RES_H2_PRICE             = prix_H2
-RES_CAPEX_BAT_POWER      = c_bat_P
-RES_CAPEX_BAT_ENERGY     = c_bat_E
-RES_PROJECT_LIFETIME     = N
-RES_DISCOUNT_RATE        = r * 100
-
-print("\n===  📥 PARAMÈTRES D'ENTRÉE ===")
-print("Puissance électrolyseur max (MW)     :", fmt(RES_MAX_PWR_ELECTRO))
-print("Prix du kg de H2 (€)                 :", fmt(RES_H2_PRICE))
-print("CAPEX batterie puissance (€)         :", fmt(RES_CAPEX_BAT_POWER))
-print("CAPEX batterie énergie (€)           :", fmt(RES_CAPEX_BAT_ENERGY))
-print("Durée de vie projet (années)         :", fmt(RES_PROJECT_LIFETIME))
-print("Taux d'actualisation (%)             :", fmt(RES_DISCOUNT_RATE))
-
-# === ⚙️ PARAMÈTRES TECHNIQUES ===
-RES_MAX_PWR_BAT          = pyo.value(model.P_bat_max)
-RES_MAX_CAPA_BAT         = pyo.value(model.E_bat_max)
-
-print("\n=== ⚙️ PARAMÈTRES TECHNIQUES ===")
-print("Puissance batterie optimale (MW)     :", fmt(RES_MAX_PWR_BAT))
-print("Capacité batterie optimale (MWh)     :", fmt(RES_MAX_CAPA_BAT))
-
-# === 🔧 PERFORMANCE ÉLECTROLYSEUR ===
-RES_MEAN_PWR_ELECTRO     = sum(pyo.value(model.P_electro[t]) for t in model.T) / len(model.T)
-RES_TOTAL_PWR_ELECTRO    = sum(pyo.value(model.P_electro[t]) for t in model.T)
-RES_ELEC_COST_MEAN       = pyo.value(cout_elec(model)) / RES_TOTAL_PWR_ELECTRO
-
-print("\n=== 🔧 PERFORMANCE ÉLECTROLYSEUR ===")
-print("Puissance moyenne électrolyseur (MW) :", fmt(RES_MEAN_PWR_ELECTRO))
-print("Coût moyen d'électricité (€/MW)      :", fmt(RES_ELEC_COST_MEAN))
-
-# === 🌱 HYDROGÈNE & CARBONE ===
-RES_H2_TOTAL             = sum(pyo.value(model.H2[t]) for t in model.T)
-RES_CO2_TOTAL            = pyo.value(emissions_co2(model))
-RES_CO2_INTENSITY_MEAN   = RES_CO2_TOTAL / RES_H2_TOTAL
-
-print("\n=== 🌱 HYDROGÈNE & CARBONE ===")
-print("Production H2 annuelle (kg)          :", fmt(RES_H2_TOTAL))
-print("Intensité carbone moyenne (kg/kg)    :", fmt(RES_CO2_INTENSITY_MEAN))
-print("Émissions CO₂ totales (T)            :", fmt(RES_CO2_TOTAL / 1000))
-
-# === 💶 ÉCONOMIE ===
-RES_TOTAL_COST           = f"{pyo.value(model.Obj):.2f}"
-RES_LCOH_OPT             = RES_TOTAL_COST / RES_H2_TOTAL
-RES_CA_TOTAL             = RES_H2_TOTAL * prix_H2
-RES_BENEF_ANNUAL         = RES_CA_TOTAL - RES_TOTAL_COST
-
-print("\n=== 💶 ÉCONOMIE ===")
-print("Chiffre d'affaire annuel (€)         :", fmt(RES_CA_TOTAL))
-print("Coût total annuel (€)                :", fmt(RES_TOTAL_COST))
-print("Bénéfice annuel (€)                  :", fmt(RES_BENEF_ANNUAL))
-print("LCOH optimisé (€/kg H2)              :", fmt(RES_LCOH_OPT))
-
-# Convertir les outputs du modèle en Series pandas
-P_spot_series     = pd.Series({t: pyo.value(model.P_spot[t])     for t in model.T})
-P_ch_series       = pd.Series({t: pyo.value(model.P_ch[t])       for t in model.T})
-P_dis_series      = pd.Series({t: pyo.value(model.P_dis[t])      for t in model.T})
-P_electro_series  = pd.Series({t: pyo.value(model.P_electro[t])  for t in model.T})
-SOC_series        = pd.Series({t: pyo.value(model.SOC[t])        for t in model.T})
-H2_series         = pd.Series({t: pyo.value(model.H2[t])         for t in model.T})
-
-# Ajouter au DataFrame existant
-df["P_spot"] = P_spot_series
-df["P_ch"] = P_ch_series
-df["P_dis"] = P_dis_series
-df["P_electro"] = P_electro_series
-df["SOC"] = SOC_series
-df["H2"] = H2_series
\ No newline at end of file
+if __name__ == "__main__":
+    model, result, RES_BAT_LIFETIME = solve_model(tee=True)
+
+    print(result.solver.status, result.solver.termination_condition)
+
+    # === 📥 PARAMÈTRES D'ENTRÉE ===
+    RES_MAX_PWR_ELECTRO      = P_electro_max
+    RES_H2_PRICE             = prix_H2
+    RES_CAPEX_BAT_POWER      = c_bat_P
+    RES_CAPEX_BAT_ENERGY     = c_bat_E
+    RES_PROJECT_LIFETIME     = N
+    RES_DISCOUNT_RATE        = r * 100
+
+    print("\n===  📥 PARAMÈTRES D'ENTRÉE ===")
+    print("Puissance électrolyseur max (MW)     :", fmt(RES_MAX_PWR_ELECTRO))
+    print("Prix du kg de H2 (€)                 :", fmt(RES_H2_PRICE))
+    print("CAPEX batterie puissance (€)         :", fmt(RES_CAPEX_BAT_POWER))
+    print("CAPEX batterie énergie (€)           :", fmt(RES_CAPEX_BAT_ENERGY))
+    print("Durée de vie projet (années)         :", fmt(RES_PROJECT_LIFETIME))
+    print("Taux d'actualisation (%)             :", fmt(RES_DISCOUNT_RATE))
+
+    # === ⚙️ PARAMÈTRES TECHNIQUES ===
+    RES_MAX_PWR_BAT          = pyo.value(model.P_bat_max)
+    RES_MAX_CAPA_BAT         = pyo.value(model.E_bat_max)
+
+    print("\n=== ⚙️ PARAMÈTRES TECHNIQUES ===")
+    print("Puissance batterie optimale (MW)     :", fmt(RES_MAX_PWR_BAT))
+    print("Capacité batterie optimale (MWh)     :", fmt(RES_MAX_CAPA_BAT))
+    print("Durée de vie batterie (années)       :", fmt(RES_BAT_LIFETIME))
+
+    # === 🔧 PERFORMANCE ÉLECTROLYSEUR ===
+    RES_MEAN_PWR_ELECTRO     = sum(pyo.value(model.P_electro[t]) for t in model.T) / len(model.T)
+    RES_TOTAL_PWR_ELECTRO    = sum(pyo.value(model.P_electro[t]) for t in model.T)
+    RES_ELEC_COST_MEAN       = pyo.value(cout_elec(model)) / RES_TOTAL_PWR_ELECTRO
+
+    print("\n=== 🔧 PERFORMANCE ÉLECTROLYSEUR ===")
+    print("Puissance moyenne électrolyseur (MW) :", fmt(RES_MEAN_PWR_ELECTRO))
+    print("Coût moyen d'électricité (€/MW)      :", fmt(RES_ELEC_COST_MEAN))
+
+    # === 🌱 HYDROGÈNE & CARBONE ===
+    RES_H2_TOTAL             = sum(pyo.value(model.H2[t]) for t in model.T)
+    RES_CO2_TOTAL            = pyo.value(emissions_co2(model))
+    RES_CO2_INTENSITY_MEAN   = RES_CO2_TOTAL / RES_H2_TOTAL
+
+    print("\n=== 🌱 HYDROGÈNE & CARBONE ===")
+    print("Production H2 annuelle (kg)          :", fmt(RES_H2_TOTAL))
+    print("Intensité carbone moyenne (kg/kg)    :", fmt(RES_CO2_INTENSITY_MEAN))
+    print("Émissions CO₂ totales (T)            :", fmt(RES_CO2_TOTAL / 1000))
+
+    # === 💶 ÉCONOMIE ===
+    RES_TOTAL_COST           = pyo.value(model.Obj)
+    RES_LCOH_OPT             = RES_TOTAL_COST / RES_H2_TOTAL
+    RES_CA_TOTAL             = RES_H2_TOTAL * prix_H2
+    RES_BENEF_ANNUAL         = RES_CA_TOTAL - RES_TOTAL_COST
+
+    print("\n=== 💶 ÉCONOMIE ===")
+    print("Chiffre d'affaire annuel (€)         :", fmt(RES_CA_TOTAL))
+    print("Coût total annuel (€)                :", fmt(RES_TOTAL_COST))
+    print("Bénéfice annuel (€)                  :", fmt(RES_BENEF_ANNUAL))
+    print("LCOH optimisé (€/kg H2)              :", fmt(RES_LCOH_OPT))
+
+    # Convertir les outputs du modèle en Series pandas
+    P_spot_series     = pd.Series({t: pyo.value(model.P_spot[t])     for t in model.T})
+    P_ch_series       = pd.Series({t: pyo.value(model.P_ch[t])       for t in model.T})
+    P_dis_series      = pd.Series({t: pyo.value(model.P_dis[t])      for t in model.T})
+    P_electro_series  = pd.Series({t: pyo.value(model.P_electro[t])  for t in model.T})
+    SOC_series        = pd.Series({t: pyo.value(model.SOC[t])        for t in model.T})
+    H2_series         = pd.Series({t: pyo.value(model.H2[t])         for t in model.T})
+
+    # Ajouter au DataFrame existant
+    df["P_spot"] = P_spot_series
+    df["P_ch"] = P_ch_series
+    df["P_dis"] = P_dis_series
+    df["P_electro"] = P_electro_series
+    df["SOC"] = SOC_series
+    df["H2"] = H2_series
\ No newline at end of file